@@ -1 +1,8 @@
+import logging
+
 from .tile import TileFile
+from .info import TileInfo
+from .progress import OperationCancelled
+
+# Quiet by default when used as a library, configure the "ScrapTiles" logger to see what it is doing
+logging.getLogger(__name__).addHandler(logging.NullHandler())
@@ -0,0 +1,61 @@
+import sys
+import argparse
+
+from . import batch, generate
+from .tile import TileFile
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ScrapTiles")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = commands.add_parser("batch", help="Apply a transform to every .tile file in a directory tree")
+    batch_parser.add_argument("source", help="Directory to search for .tile files")
+    batch_parser.add_argument("--transform", "-t", default="resave", choices=sorted(batch.TRANSFORMS))
+    batch_parser.add_argument("--output", "-o", default=None, help="Output directory (mirrors source). Overwrites in place if not given")
+    batch_parser.add_argument("--workers", "-w", type=int, default=None, help="Worker processes (default: cpu count)")
+    batch_parser.add_argument("--progress", "-p", default=None, help="Progress file, files already done in it are skipped")
+    batch_parser.add_argument("--compression", "-c", default="hc", help="Compression for re-encoded sub cells (hc, fast, auto, 1-12)")
+
+    compact_parser = commands.add_parser("compact", help="Rewrite tiles to drop the dead bytes left by incremental saves")
+    compact_parser.add_argument("files", nargs="+", help=".tile files to compact in place")
+
+    generate_parser = commands.add_parser("generate", help="Write a synthetic tile of any size, for testing")
+    generate_parser.add_argument("output", help="Where to write the .tile file")
+    generate_parser.add_argument("--width", type=int, default=8, help="Width in cells")
+    generate_parser.add_argument("--height", type=int, default=8, help="Height in cells")
+    generate_parser.add_argument("--terrain", default="noise", choices=generate.TERRAINS)
+    generate_parser.add_argument("--assets", type=int, default=0, help="Random assets per cell")
+    generate_parser.add_argument("--seed", type=int, default=None, help="Seed, the same seed gives the same file")
+    generate_parser.add_argument("--compression", "-c", default="fast", help="Compression (hc, fast, auto, 1-12)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "batch":
+        compression = int(args.compression) if args.compression.isdigit() else args.compression
+
+        summary = batch.run_batch(args.source, args.transform, args.output, args.workers, args.progress, compression)
+        batch.print_summary(summary)
+
+        return 1 if summary["error"] else 0
+
+    if args.command == "compact":
+        for file_path in args.files:
+            before = TileFile.stat(file_path)
+
+            TileFile(file_path, lazy=True).compact()
+
+            after = TileFile.stat(file_path)
+            print(f"[INFO] {file_path}: {before.file_size} -> {after.file_size} bytes ({before.dead_bytes} dead bytes removed)")
+
+    if args.command == "generate":
+        compression = int(args.compression) if args.compression.isdigit() else args.compression
+
+        info = generate.generate_tile(args.output, args.width, args.height, args.terrain, args.assets, args.seed, compression=compression)
+        print(f"[INFO] {args.output}: {info.width}x{info.height} cells, {info.file_size} bytes")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .tile import TileFile
+
+
+def transform_resave(tile):
+    # Nothing to change, untouched sub cells are copied straight across
+    return {}
+
+
+def transform_recompress(tile):
+    # Re-materialise every sub cell, re-encoding and recompressing all of it
+    tile.load_sub_cells(list(tile.iter_sub_cells()))
+    return {"recompress": True}
+
+
+def transform_strip_assets(tile):
+    for cell_index, cell in enumerate(tile.world_data):
+        cell["assets"] = [(0, 0, 0) for _ in cell["assets"]]
+
+        section = tile.cell_headers[cell_index]["assets"]
+        for field in section:
+            section[field][:] = 0
+
+    return {}
+
+
+# name -> function(tile) returning extra keyword arguments for write_file
+TRANSFORMS = {
+    "resave": transform_resave,
+    "recompress": transform_recompress,
+    "strip-assets": transform_strip_assets,
+}
+
+
+def find_tiles(source_dir, extension=".tile"):
+    for root, dirs, files in os.walk(source_dir):
+        dirs.sort()
+        for file_name in sorted(files):
+            if file_name.lower().endswith(extension):
+                yield os.path.join(root, file_name)
+
+
+def process_file(source_path, output_path, transform_name, compression="hc"):
+    start = time.perf_counter()
+    result = {"path": source_path, "output": output_path, "bytes_in": os.path.getsize(source_path)}
+
+    try:
+        tile = TileFile(source_path, lazy=True)
+        write_kwargs = TRANSFORMS[transform_name](tile)
+
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        tile.write_file(output_path, compression=compression, **write_kwargs)
+
+        result["status"] = "ok"
+        result["bytes_out"] = os.path.getsize(output_path)
+
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["traceback"] = traceback.format_exc()
+
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def load_progress(progress_file):
+    done = set()
+    if progress_file and os.path.exists(progress_file):
+        with open(progress_file, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Partially written last line from an interrupted run
+
+                if entry.get("status") == "ok":
+                    done.add(entry["path"])
+    return done
+
+
+def run_batch(source_dir, transform_name, output_dir=None, workers=None, progress_file=None, compression="hc", max_in_flight=None):
+    if transform_name not in TRANSFORMS:
+        raise ValueError(f"Unknown transform '{transform_name}', expected one of {sorted(TRANSFORMS)}")
+
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 2
+
+    done = load_progress(progress_file)
+    summary = {"ok": 0, "error": 0, "skipped": 0, "bytes_in": 0, "bytes_out": 0, "errors": []}
+
+    def output_path_for(path):
+        if output_dir is None:
+            return path
+        return os.path.join(output_dir, os.path.relpath(path, source_dir))
+
+    start = time.perf_counter()
+    progress = open(progress_file, "a") if progress_file else None
+
+    try:
+        with ProcessPoolExecutor(workers) as pool:
+            pending = set()
+
+            def handle(future):
+                result = future.result()
+                summary[result["status"]] += 1
+                summary["bytes_in"] += result["bytes_in"]
+
+                if result["status"] == "ok":
+                    summary["bytes_out"] += result["bytes_out"]
+                    print(f"[OK] {result['path']} ({result['seconds']:.2f}s)")
+                else:
+                    summary["errors"].append((result["path"], result["error"]))
+                    print(f"[ERROR] {result['path']} | {result['error']}")
+
+                if progress is not None:
+                    result.pop("traceback", None)
+                    progress.write(json.dumps(result) + "\n")
+                    progress.flush()
+
+            for path in find_tiles(source_dir):
+                if path in done:
+                    summary["skipped"] += 1
+                    continue
+
+                # Bounded number of files in flight, so memory does not grow with the size of the directory
+                if len(pending) >= max_in_flight:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        handle(future)
+
+                pending.add(pool.submit(process_file, path, output_path_for(path), transform_name, compression))
+
+            for future in wait(pending).done:
+                handle(future)
+
+    finally:
+        if progress is not None:
+            progress.close()
+
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+
+def print_summary(summary):
+    seconds = max(summary["seconds"], 1e-9)
+    processed = summary["ok"] + summary["error"]
+
+    print(
+        f"[INFO] {summary['ok']} ok, {summary['error']} failed, {summary['skipped']} skipped in {summary['seconds']:.2f}s | "
+        f"{processed / seconds:.1f} files/s, {summary['bytes_in'] / seconds / 1024 / 1024:.2f} MB/s in, "
+        f"{summary['bytes_out'] / seconds / 1024 / 1024:.2f} MB/s out"
+    )
+    for path, error in summary["errors"]:
+        print(f" - {path}: {error}")
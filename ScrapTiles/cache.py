@@ -0,0 +1,144 @@
+import os
+import struct
+import hashlib
+import threading
+
+from .readwrite.mip import MipChunk
+
+
+class DecodeCache:
+    """
+    On disk cache of decoded sub cells, shared between runs and tiles.
+
+    Entries are keyed by a hash of the compressed bytes, data type, tile version and codec, so identical chunks
+    (templates, copies of Empty.tile, repeated mip levels...) are only ever decompressed / decoded once.
+    Least recently used entries are removed once the cache grows over max_bytes.
+
+    Entries are plain data, never pickles, as the directory may be shared: mip chunks as their raw bytes plus dimensions.
+    Anything that can't be read back is treated as a miss.
+
+    Only data types whose hit path beats decoding are cached. Asset lists aren't, rebuilding their dicts costs about
+    as much as decoding them in the first place.
+    """
+    FORMAT_VERSION = 5  # Bump when the decoded layout of any codec changes
+    DATA_TYPES = ("mip",)
+    MISS = object()
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size = None  # Lazily calculated total size of the cache on disk
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __getstate__(self):
+        # Sent to worker processes, the size estimate is recalculated there
+        return {"directory": self.directory, "max_bytes": self.max_bytes, "_size": None}
+
+    def key(self, sub_cell, decode_func):
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(sub_cell.compressed_data)
+        digest.update((
+            f"|{sub_cell.type}|{sub_cell.version}|{sub_cell.meta_data.get('size')}|{sub_cell.meta_data.get('count')}"  # Codecs read both
+            f"|{decode_func.__module__}.{decode_func.__qualname__}|{self.FORMAT_VERSION}"
+        ).encode())
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".bin")
+
+    @staticmethod
+    def dumps(data):
+        # Returns None for data this cache doesn't know how to store
+        if isinstance(data, MipChunk):
+            return b"M" + struct.pack("<II", data.vertex_dim, data.ground_dim) + data.tobytes()
+
+        return None
+
+    @staticmethod
+    def loads(payload):
+        tag = payload[:1]
+
+        if tag == b"M":
+            vertex_dim, ground_dim = struct.unpack_from("<II", payload, 1)
+            chunk_data = bytearray(payload[9:])  # Writable, like a freshly decompressed chunk
+            if len(chunk_data) != (vertex_dim * vertex_dim + ground_dim * ground_dim) * 8:
+                raise ValueError("Mip chunk size does not match its dimensions")
+            return MipChunk.from_buffer(chunk_data, vertex_dim, ground_dim)
+
+        raise ValueError(f"Unknown cache entry type {tag!r}")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = self.loads(f.read())
+        except Exception:  # Missing, truncated, corrupt or from something else, all just a miss
+            return self.MISS
+
+        try:
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            pass
+
+        return data
+
+    def put(self, key, data):
+        payload = self.dumps(data)
+        if payload is None:
+            return
+
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(payload)
+            size = f.tell()
+
+        os.replace(temp_path, path)
+
+        if self._size is None:
+            self._size = self.size()
+        else:
+            self._size += size
+
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def entries(self):
+        for root, _, files in os.walk(self.directory):
+            for file_name in files:
+                if file_name.endswith(".bin"):
+                    path = os.path.join(root, file_name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, target_bytes=None):
+        # Removes the least recently used entries until the cache is under target_bytes (90% of max by default)
+        if target_bytes is None:
+            target_bytes = int(self.max_bytes * 0.9)
+
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in entries:
+            if total <= target_bytes:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+        self._size = total
+
+    def clear(self):
+        self.evict(0)
@@ -0,0 +1,96 @@
+import numpy as np
+
+
+# (name, levels, has_count) in the order they are stored in a cell header. Each section stores
+# [count], index, compressed and size, either as a single int32 or as an int32[levels] array
+CELL_HEADER_SECTIONS = (
+    ("mip", 6, False),
+    ("clutter", 1, False),
+    ("assets", 4, True),
+    ("blueprint", 1, True),
+    ("node", 1, True),
+    ("script", 1, True),
+    ("prefab", 1, True),
+    ("decal", 1, True),
+    ("harvestable", 4, True),
+    ("kinematics", 4, True),
+    ("unknown", 1, True),
+    ("voxel_terrain", 1, True),
+)
+
+
+def _section_dtype(levels, has_count):
+    fields = ("count", "index", "compressed", "size") if has_count else ("index", "compressed", "size")
+    if levels == 1:
+        return [(field, "<i4") for field in fields]
+    return [(field, "<i4", (levels,)) for field in fields]
+
+
+CELL_HEADER_DTYPE = np.dtype([
+    (name, _section_dtype(levels, has_count))
+    for name, levels, has_count in CELL_HEADER_SECTIONS
+])
+
+
+def read_cell_header_table(data, offset, count):
+    # Copied so the table can be edited, the source is often read-only (bytes / mmap)
+    return np.frombuffer(data, dtype=CELL_HEADER_DTYPE, count=count, offset=offset).copy()
+
+
+class CellHeaderSection:
+    """ Dict-like view of one section of one cell header, e.g. header["assets"]["count"][2]. """
+
+    def __init__(self, table, cell_index, name):
+        self.table = table
+        self.cell_index = cell_index
+        self.name = name
+        self.multiple = table.dtype[name]["index"].shape != ()
+
+    def __getitem__(self, field):
+        value = self.table[self.name][field][self.cell_index]
+        if self.multiple:
+            return value  # Writable view into the table
+        return int(value)
+
+    def __setitem__(self, field, value):
+        self.table[self.name][field][self.cell_index] = value
+
+    def __contains__(self, field):
+        return field in self.table.dtype[self.name].names
+
+    def __iter__(self):
+        return iter(self.table.dtype[self.name].names)
+
+    def keys(self):
+        return self.table.dtype[self.name].names
+
+    def to_dict(self):
+        return {
+            field: tuple(int(v) for v in self[field]) if self.multiple else self[field]
+            for field in self.keys()
+        }
+
+
+class CellHeader:
+    """ Dict-like view of one record of the cell header table, mirrors the old nested dict layout. """
+
+    def __init__(self, table, cell_index):
+        self.table = table
+        self.cell_index = cell_index
+
+    def __getitem__(self, name):
+        if name not in self.table.dtype.names:
+            raise KeyError(name)
+        return CellHeaderSection(self.table, self.cell_index, name)
+
+    def __contains__(self, name):
+        return name in self.table.dtype.names
+
+    def __iter__(self):
+        return iter(self.table.dtype.names)
+
+    def keys(self):
+        return self.table.dtype.names
+
+    def to_dict(self):
+        return {name: self[name].to_dict() for name in self.keys()}
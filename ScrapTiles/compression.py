@@ -0,0 +1,89 @@
+import time
+import threading
+import lz4.block
+
+
+class Compressor:
+    """
+    Picks the lz4 settings used for each sub cell when writing a tile, and keeps a report of what it did.
+
+    compression can be:
+     - "hc"    : lz4 high compression at the default level (what the game writes)
+     - "fast"  : plain lz4, much faster but larger
+     - 1 - 12  : lz4 high compression at the given level
+     - "auto"  : max level for small chunks, default level for large ones. If a time_budget (seconds) is given,
+                 falls back to "fast" once the save is projected to go over it.
+    """
+    MODES = ("fast", "hc", "auto")
+    HC_DEFAULT_LEVEL = 9
+    HC_MAX_LEVEL = 12
+    AUTO_SMALL_CHUNK = 16 * 1024
+
+    def __init__(self, compression="hc", time_budget=None, total_bytes=0):
+        if compression == "high_compression":
+            compression = "hc"
+
+        if compression not in self.MODES and not (type(compression) is int and 1 <= compression <= self.HC_MAX_LEVEL):
+            raise ValueError(f"Unknown compression '{compression}', expected one of {self.MODES} or a level from 1 to {self.HC_MAX_LEVEL}")
+
+        self.compression = compression
+        self.time_budget = time_budget
+        self.remaining_bytes = total_bytes
+
+        self.report = {}  # [data_type] -> {"modes", "raw", "compressed", "seconds"}
+        self.started = None
+        self.compressed_bytes = 0
+        self._lock = threading.Lock()
+
+    def choose(self, data_type, size):
+        if self.compression == "fast":
+            return "fast", {"mode": "fast"}
+
+        if self.compression == "hc":
+            return f"hc{self.HC_DEFAULT_LEVEL}", {"mode": "high_compression"}
+
+        if type(self.compression) is int:
+            return f"hc{self.compression}", {"mode": "high_compression", "compression": self.compression}
+
+        # auto
+        if self.time_budget is not None and self.compressed_bytes > 0:
+            elapsed = time.perf_counter() - self.started
+            throughput = self.compressed_bytes / max(elapsed, 1e-9)
+
+            if elapsed + self.remaining_bytes / throughput > self.time_budget:
+                return "fast", {"mode": "fast"}
+
+        level = self.HC_MAX_LEVEL if size <= self.AUTO_SMALL_CHUNK else self.HC_DEFAULT_LEVEL
+        return f"hc{level}", {"mode": "high_compression", "compression": level}
+
+    def compress(self, data_type, raw_data):
+        with self._lock:
+            if self.started is None:
+                self.started = time.perf_counter()
+            label, settings = self.choose(data_type, len(raw_data))
+
+        start = time.perf_counter()
+        compressed_data = lz4.block.compress(raw_data, store_size=False, **settings)
+        seconds = time.perf_counter() - start
+
+        self.record(data_type, label, len(raw_data), len(compressed_data), seconds)
+        return compressed_data
+
+    def record(self, data_type, label, raw_size, compressed_size, seconds=0.0):
+        with self._lock:
+            section = self.report.setdefault(data_type, {"modes": {}, "raw": 0, "compressed": 0, "seconds": 0.0})
+            section["modes"][label] = section["modes"].get(label, 0) + 1
+            section["raw"] += raw_size
+            section["compressed"] += compressed_size
+            section["seconds"] += seconds
+
+            if label != "copied":
+                self.compressed_bytes += raw_size
+                self.remaining_bytes = max(0, self.remaining_bytes - raw_size)
+
+    def totals(self):
+        return {
+            "raw": sum(section["raw"] for section in self.report.values()),
+            "compressed": sum(section["compressed"] for section in self.report.values()),
+            "seconds": sum(section["seconds"] for section in self.report.values()),
+        }
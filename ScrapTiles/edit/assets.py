@@ -1,13 +1,17 @@
+import logging
 from collections import defaultdict
 
 from ..sub_tile import SubCellData
 
 
+logger = logging.getLogger(__name__)
+
+
 class Modifier:
     def __init__(self, tile):
         self.tile = tile
 
-        self.cell_size = 65
+        self.cell_size = self.tile.CELL_WORLD_SIZE
 
         self.tile_shape = (
             self.tile.header["width"],
@@ -131,7 +135,7 @@ class Modifier:
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         if exc_type is not None:  # Exception raised, Do not save changes as it may now contain bad data.
-            print("[WARNING] An error occurred when modifying Asset data, No changes have been made.")
+            logger.warning("An error occurred when modifying Asset data, No changes have been made.")
             return False  # Let it propagate
         else:
             self.update()
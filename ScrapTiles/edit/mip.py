@@ -1,6 +1,10 @@
 from scipy.ndimage import zoom
 import numpy as np
 import math
+import logging
+
+
+logger = logging.getLogger(__name__)
 
 
 class Materials:
@@ -90,8 +94,7 @@ class Modifier:
             x = idx % grid_dim
             y = idx // grid_dim
 
-            tile = chunk["mip"][depth].data[data_key]
-            tile_array = np.array(tile, dtype=required_dtype).reshape((tile_size, tile_size))
+            tile_array = chunk["mip"][depth].data.grid(data_key)
 
             x_start = x * tile_size
             y_start = y * tile_size
@@ -123,8 +126,8 @@ class Modifier:
 
             tile_chunk = full_map[y_start:y_start + tile_size, x_start:x_start + tile_size]#.astype(np.float32)
 
-            # Update the data in the mip level
-            chunk["mip"][depth].data[data_key] = tile_chunk.flatten().tolist()
+            # Update the data in the mip level, the chunk takes a copy
+            chunk["mip"][depth].data[data_key] = tile_chunk
 
     @staticmethod
     def __down_scale(arr, new_shape):
@@ -229,7 +232,7 @@ class Modifier:
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         if exc_type is not None:  # Exception raised, Do not save changes as it may now contain bad data.
-            print("[WARNING] An error occurred when modifying MIP data, No changes have been made.")
+            logger.warning("An error occurred when modifying MIP data, No changes have been made.")
             return False  # Let it propagate
         else:
             self.update()
@@ -0,0 +1,265 @@
+import os
+import time
+import logging
+
+import numpy as np
+
+from .tile import TileFile
+from .sub_tile import SubCellData
+from .cell_header import CELL_HEADER_DTYPE, CELL_HEADER_SECTIONS, CellHeader
+from .compression import Compressor
+from .progress import ProgressReporter
+from .edit.assets import Assets
+from .readwrite.mip import VERTEX_DTYPE
+
+
+logger = logging.getLogger(__name__)
+
+
+TERRAINS = ("flat", "noise", "random")
+
+CELL_SPAN = 64.0  # World units between the first and last vertex of a cell
+MIP_LEVELS = 6
+ASSET_REGION = 2  # Which of the 4 asset lists generated assets go in
+
+# Level 0 is 33x33 vertices and 65x65 ground samples, each level halves the spacing
+MIP_DIMENSIONS = [(32 // 2 ** level + 1, 64 // 2 ** level + 1) for level in range(MIP_LEVELS)]
+
+# Same layout as readwrite.assetList for version >= 12, with no colour map
+ASSET_RECORD_DTYPE = np.dtype([
+    ("position", "<f4", (3,)),
+    ("rotation", "<f4", (4,)),
+    ("scale", "<f4", (3,)),
+    ("uuid", "V16"),
+    ("colour_count", "u1"),
+    ("unknown", "u1"),
+])
+
+EMPTY_CLUTTER = b"\x00" + b"\xff" * 16384  # What the game writes for a cell without clutter
+DEFAULT_COLOUR = 0xFFFFFFFF
+DEFAULT_GROUND = 0xF  # Full weight DefaultGrass
+
+ASSET_UUIDS = np.frombuffer(b"".join(
+    bytes.fromhex(value) for name, value in vars(Assets).items() if not name.startswith("_")
+), dtype="V16")
+
+
+def empty_tile(width, height, version=13, uuid=None, creator_id=0):
+    # A TileFile with a header and zeroed cell headers, every sub cell is empty
+    tile = TileFile(None)
+    tile.header = {
+        "version": version,
+        "uuid": uuid or os.urandom(16).hex(),
+        "creator_id": creator_id,
+        "width": width,
+        "height": height,
+        "cell_header_offset": TileFile.HEADER_SIZE,
+        "cell_header_size": TileFile.CELL_DATA_SIZE,
+        "some_val1": TileFile.HEADER_SIZE + TileFile.CELL_DATA_SIZE * width * height,  # Data offset
+        "some_val2": 0,  # Data size
+        "type": 0,
+    }
+
+    tile.cell_header_table = np.zeros(width * height, dtype=CELL_HEADER_DTYPE)
+    tile.cell_headers = [CellHeader(tile.cell_header_table, index) for index in range(width * height)]
+    tile.world_data = [
+        {name: [(0, 0, 0) for _ in range(levels)] for name, levels, has_count in CELL_HEADER_SECTIONS}
+        for _ in range(width * height)
+    ]
+    return tile
+
+
+def _lattice(ix, iy, seed):
+    # Integer hash of the lattice points, mapped to [-1, 1]
+    h = (ix.astype(np.uint64) * 0x9E3779B1 + iy.astype(np.uint64) * 0x85EBCA77 + seed * 0xC2B2AE3D) & 0xFFFFFFFF
+    h ^= h >> 15
+    h = (h * 0x2C1B3C6D) & 0xFFFFFFFF
+    h ^= h >> 12
+    h = (h * 0x297A2D39) & 0xFFFFFFFF
+    h ^= h >> 15
+    return h / 0xFFFFFFFF * 2 - 1
+
+
+def value_noise(x, y, seed=0, scale=80.0, octaves=4, persistence=0.5, lacunarity=2.0):
+    """ Fractal value noise in [-1, 1] at world positions x, y (arrays). Continuous, so neighbouring cells line up """
+    total = np.zeros(np.broadcast(x, y).shape)
+    amplitude = 1.0
+    frequency = 1.0 / scale
+    norm = 0.0
+
+    for octave in range(octaves):
+        fx = x * frequency
+        fy = y * frequency
+        x0 = np.floor(fx)
+        y0 = np.floor(fy)
+
+        tx = fx - x0
+        ty = fy - y0
+        tx = tx * tx * (3 - 2 * tx)
+        ty = ty * ty * (3 - 2 * ty)
+
+        # Hash each lattice point in range once, then gather the corners from that table
+        ix = x0.astype(np.int64)
+        iy = y0.astype(np.int64)
+        x_min, y_min = ix.min(), iy.min()
+        table = _lattice(np.arange(x_min, ix.max() + 2)[None, :], np.arange(y_min, iy.max() + 2)[:, None], seed + octave)
+
+        ix = ix - x_min
+        iy = iy - y_min
+        a = table[iy, ix]
+        b = table[iy, ix + 1]
+        c = table[iy + 1, ix]
+        d = table[iy + 1, ix + 1]
+
+        total += amplitude * (a + (b - a) * tx + (c - a) * ty + (a - b - c + d) * tx * ty)
+        norm += amplitude
+        amplitude *= persistence
+        frequency *= lacunarity
+
+    return total / norm
+
+
+class TerrainGenerator:
+    def __init__(self, terrain="noise", seed=None, height_range=(0.0, 40.0), noise_scale=80.0):
+        if terrain not in TERRAINS:
+            raise ValueError(f"Unknown terrain '{terrain}', expected one of {TERRAINS}")
+
+        self.terrain = terrain
+        self.rng = np.random.default_rng(seed)
+        self.noise_seed = int(self.rng.integers(2 ** 31))
+        self.height_range = height_range
+        self.noise_scale = noise_scale
+
+    def heights(self, x, y):
+        low, high = self.height_range
+        shape = np.broadcast(x, y).shape
+
+        if self.terrain == "flat":
+            return np.full(shape, low, dtype=np.float32)
+
+        if self.terrain == "random":
+            return self.rng.uniform(low, high, shape).astype(np.float32)
+
+        noise = value_noise(x, y, self.noise_seed, self.noise_scale)
+        return ((noise + 1) / 2 * (high - low) + low).astype(np.float32)
+
+    def colours(self, shape):
+        if self.terrain == "random":
+            return self.rng.integers(0, 2 ** 32, shape, dtype=np.uint32)
+        return np.full(shape, DEFAULT_COLOUR, dtype=np.uint32)
+
+    def ground(self, shape):
+        if self.terrain == "random":
+            materials = self.rng.integers(0, 16, shape, dtype=np.uint64)
+            return (np.uint64(0xF) << (materials * np.uint64(4))).view(np.int64)
+        return np.full(shape, DEFAULT_GROUND, dtype=np.int64)
+
+    def mip_row(self, cell_y, width, level):
+        # Raw mip chunks for a whole row of cells, the terrain is sampled in one go for the row
+        vertex_dim, ground_dim = MIP_DIMENSIONS[level]
+
+        offsets = np.arange(width)[:, None] * CELL_SPAN
+        x = offsets + np.linspace(0, CELL_SPAN, vertex_dim)[None, :]  # (cell, vertex_x)
+        y = cell_y * CELL_SPAN + np.linspace(0, CELL_SPAN, vertex_dim)
+
+        heights = self.heights(x[None, :, :], y[:, None, None])  # (vertex_y, cell, vertex_x)
+        colours = self.colours(heights.shape)
+        ground = self.ground((width, ground_dim * ground_dim))
+
+        vertices = np.empty((width, vertex_dim, vertex_dim), dtype=VERTEX_DTYPE)
+        vertices["height"] = heights.transpose(1, 0, 2)
+        vertices["colour"] = colours.transpose(1, 0, 2)
+
+        return [vertices[cell].tobytes() + ground[cell].tobytes() for cell in range(width)]
+
+    def assets_row(self, cell_y, width, count):
+        # Raw asset lists for a whole row of cells, count random assets in each
+        records = np.zeros((width, count), dtype=ASSET_RECORD_DTYPE)
+
+        local = self.rng.uniform(0, CELL_SPAN, (width, count, 2))
+        angle = self.rng.uniform(0, 2 * np.pi, (width, count))
+        scale = self.rng.uniform(0.5, 1.5, (width, count))
+
+        records["position"][..., :2] = local
+        records["position"][..., 2] = self.heights(
+            np.arange(width)[:, None] * CELL_SPAN + local[..., 0], cell_y * CELL_SPAN + local[..., 1]
+        )
+        records["rotation"][..., 2] = np.sin(angle / 2)
+        records["rotation"][..., 3] = np.cos(angle / 2)
+        records["scale"] = scale[..., None]
+        records["uuid"] = ASSET_UUIDS[self.rng.integers(len(ASSET_UUIDS), size=(width, count))]
+
+        return [records[cell].tobytes() for cell in range(width)]
+
+
+def generate_tile(output_file_path, width, height, terrain="noise", assets_per_cell=0, seed=None, height_range=(0.0, 40.0),
+                  noise_scale=80.0, compression="fast", progress=None):
+    """
+    Writes a width x height cell tile with generated terrain (flat, noise or random) and assets_per_cell random assets
+    per cell. Cells are generated a row at a time and streamed to disk, so memory use does not grow with the tile.
+    Returns the TileInfo of the new file.
+    """
+    generator = TerrainGenerator(terrain, seed, height_range, noise_scale)
+    tile = empty_tile(width, height, uuid=generator.rng.bytes(16).hex())
+    version = tile.header["version"]
+
+    compressor = Compressor(compression)
+    progress = ProgressReporter(progress)
+
+    data_offset = tile.header["some_val1"]
+    offset = data_offset
+    clutter = compressor.compress("clutter", EMPTY_CLUTTER)  # The same for every cell
+
+    def compress(data_type, raw_data):
+        return clutter if data_type == "clutter" else compressor.compress(data_type, raw_data)
+
+    start = time.perf_counter()
+    try:
+        with open(output_file_path, "wb") as f:
+            f.seek(data_offset)
+
+            for cell_y in range(height):
+                progress.update("generate", cell_y, height)
+
+                # (cell_index, data_type, level, count, raw data)
+                chunks = []
+                mip_rows = [generator.mip_row(cell_y, width, level) for level in range(MIP_LEVELS)]
+                asset_row = generator.assets_row(cell_y, width, assets_per_cell) if assets_per_cell else None
+                for cell_x in range(width):
+                    cell_index = cell_y * width + cell_x
+                    for level in range(MIP_LEVELS):
+                        chunks.append((cell_index, "mip", level, None, mip_rows[level][cell_x]))
+
+                    chunks.append((cell_index, "clutter", 0, None, EMPTY_CLUTTER))
+
+                    if assets_per_cell:
+                        chunks.append((cell_index, "assets", ASSET_REGION, assets_per_cell, asset_row[cell_x]))
+
+                for cell_index, data_type, level, count, raw_data in chunks:
+                    compressed_data = compress(data_type, raw_data)
+                    sub_cell = SubCellData(data_type, raw_data, {"count": count}, version)
+
+                    f.write(compressed_data)
+                    tile.update_cell_header(
+                        tile.cell_headers[cell_index][data_type], level, sub_cell, offset, len(compressed_data), len(raw_data)
+                    )
+                    offset += len(compressed_data)
+
+            tile.header["some_val2"] = offset - data_offset
+
+            f.seek(0)
+            f.write(tile.write_header(b""))
+            f.write(tile.cell_header_table.tobytes())
+
+    except BaseException:
+        if os.path.exists(output_file_path):
+            os.remove(output_file_path)
+        raise
+
+    progress.update("generate", height, height)
+    logger.info(
+        "Generated %dx%d tile '%s' (%s terrain, %d assets per cell): %d bytes in %.3fs",
+        width, height, output_file_path, terrain, assets_per_cell, offset, time.perf_counter() - start
+    )
+
+    return TileFile.stat(output_file_path)
@@ -0,0 +1,63 @@
+from .cell_header import CELL_HEADER_SECTIONS
+
+
+class TileInfo:
+    """ Summary of a tile built from only its file header and cell header table (see TileFile.stat) """
+
+    def __init__(self, file_path, header, cell_header_table, file_size=None):
+        self.file_path = file_path
+        self.file_size = file_size
+
+        self.version = header["version"]
+        self.uuid = header["uuid"]
+        self.creator_id = header["creator_id"]
+        self.width = header["width"]
+        self.height = header["height"]
+        self.data_offset = header["cell_header_offset"] + cell_header_table.nbytes
+
+        self.sections = {}  # [data_type] -> {"count", "sub_cells", "compressed", "size"}
+        for name, _, has_count in CELL_HEADER_SECTIONS:
+            section = cell_header_table[name]
+            present = (section["index"] > 0) & (section["compressed"] > 0)
+
+            self.sections[name] = {
+                "count": int(section["count"][present].sum()) if has_count else None,
+                "sub_cells": int(present.sum()),
+                "compressed": int(section["compressed"][present].sum()),
+                "size": int(section["size"][present].sum()),
+            }
+
+    @property
+    def asset_count(self):
+        return self.sections["assets"]["count"]
+
+    @property
+    def compressed_size(self):
+        return sum(section["compressed"] for section in self.sections.values())
+
+    @property
+    def uncompressed_size(self):
+        return sum(section["size"] for section in self.sections.values())
+
+    @property
+    def dead_bytes(self):
+        # Bytes in the data blob no cell header points to, e.g. left behind by incremental saves
+        if self.file_size is None:
+            return None
+        return self.file_size - self.data_offset - self.compressed_size
+
+    def to_dict(self):
+        return {
+            "file_path": self.file_path,
+            "file_size": self.file_size,
+            "version": self.version,
+            "uuid": self.uuid,
+            "creator_id": self.creator_id,
+            "width": self.width,
+            "height": self.height,
+            "dead_bytes": self.dead_bytes,
+            "sections": self.sections,
+        }
+
+    def __repr__(self):
+        return f"TileInfo('{self.file_path}', version={self.version}, size={self.width}x{self.height}, assets={self.asset_count})"
@@ -0,0 +1,31 @@
+import time
+
+
+class OperationCancelled(Exception):
+    """ Raised when a progress callback returns False """
+
+
+class ProgressReporter:
+    """
+    Rate limited wrapper around a progress callback: callback(phase, done, total).
+
+    The callback is called at most once every `interval` seconds (plus always at the start and end of a phase).
+    If it returns False the running load / save is cancelled with OperationCancelled.
+    """
+
+    def __init__(self, callback=None, interval=0.1):
+        self.callback = callback
+        self.interval = interval
+        self._last_update = 0.0
+
+    def update(self, phase, done, total):
+        if self.callback is None:
+            return
+
+        now = time.perf_counter()
+        if 0 < done < total and now - self._last_update < self.interval:
+            return
+
+        self._last_update = now
+        if self.callback(phase, done, total) is False:
+            raise OperationCancelled(f"{phase} cancelled at {done}/{total}")
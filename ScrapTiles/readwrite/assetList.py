@@ -1,5 +1,7 @@
 import struct
 
+import numpy as np
+
 
 
 class MemoryWrapper:
@@ -79,64 +81,108 @@ def debug(decompressed_data, metadata):
 
 
 
-def read_assetList(decompressed_data, metadata, version=13):
-    objects = []
-    memory = MemoryWrapper(decompressed_data)
-    index = 0
+def scan_assetList(decompressed_data, count, version=13):
+    # Only the colour maps vary in length, so one pass over them finds where every record starts.
+    # Returns the record offsets, colour maps and unknown values (None before version 12)
+    if count and version < 4:
+        raise NotImplementedError("Pre-version 4 UUID parsing not implemented.")
 
-    #debug(decompressed_data, metadata)
-
-    for _ in range(metadata["count"]):
-        position = memory.read_vec3(index)
-        rotation = memory.read_quat(index + 0xC)
+    data = decompressed_data
+    fixed_size = (0x20 if version < 5 else 0x28) + 0x10  # Transform, then UUID
 
-        if version < 5:
-            scale_value = memory.read_float(index + 0x1C)
-            scale = (scale_value, scale_value, scale_value)
-            index += 0x20
-        else:
-            scale = memory.read_vec3(index + 0x1C)
-            index += 0x28
+    # Most lists have no colour maps at all, then every record is the same size. If every colour count byte at
+    # those offsets is 0 the offsets are right (each record's end is where the next is assumed to start)
+    record_size = fixed_size + 1 + (version >= 12)
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if count * record_size <= len(buffer):
+        offsets = np.arange(count, dtype=np.int64) * record_size
+        if not buffer[offsets + fixed_size].any():
+            unknown_values = buffer[offsets + fixed_size + 1].tolist() if version >= 12 else [None] * count
+            return offsets, [{} for _ in range(count)], unknown_values
 
-        if version < 4:
-            raise NotImplementedError("Pre-version 4 UUID parsing not implemented.")
+    offsets = []
+    colour_maps = []
+    unknown_values = []
+    index = 0
 
-        else:
-            f_uuid = memory.read_uuid(index)
-            index += 0x10
+    for _ in range(count):
+        offsets.append(index)
+        index += fixed_size
 
         colour_map = {}
-        bVar4 = memory.read_uint8(index)
+        colour_count = data[index]
         index += 1
 
-        if bVar4 != 0:
-            for _ in range(bVar4):
-                key_len = memory.read_uint8(index)
+        for _ in range(colour_count):
+            key_len = data[index]
+            index += 1
+            key = str(data[index:index + key_len], "utf-8")
+            index += key_len
+            color = int.from_bytes(data[index:index + 4], "little")
+            index += 4
 
-                index += 1
-                key = memory.read_string(index, key_len)
-                index += key_len
-                color = memory.read_uint32(index)
-                index += 4
+            if key not in colour_map:
+                colour_map[key] = color
 
-                if key not in colour_map:
-                    colour_map[key] = color
+        colour_maps.append(colour_map)
 
-        unknown_value = None
         if version >= 12:  # Unknown value
-            unknown_value = decompressed_data[index]
-            index += 1  # Skip 1 byte for the newest version of .tile
+            unknown_values.append(data[index])
+            index += 1
+        else:
+            unknown_values.append(None)
+
+    return np.array(offsets, dtype=np.int64), colour_maps, unknown_values
+
+
+def read_assetList_arrays(decompressed_data, metadata, version=13):
+    """
+    Bulk decode of an asset list: position (n, 3), rotation (n, 4), scale (n, 3) float32 arrays and uuid (n, 16) uint8,
+    plus the per object colourMap dicts and unknown values. The fixed fields are gathered in one go from the record offsets.
+    """
+    offsets, colour_maps, unknown_values = scan_assetList(decompressed_data, metadata["count"], version)
+
+    # Position (3f), rotation (4f) then scale, a single float before version 5 and 3f after
+    transform_size = 0x20 if version < 5 else 0x28
 
-        objects.append({
+    buffer = np.frombuffer(decompressed_data, dtype=np.uint8)
+    fields = buffer[offsets[:, None] + np.arange(transform_size)].view("<f4")
+    uuids = buffer[offsets[:, None] + transform_size + np.arange(0x10)]
+
+    scale = fields[:, 7:10] if version >= 5 else np.repeat(fields[:, 7:8], 3, axis=1)
+
+    return {
+        "position": fields[:, 0:3],
+        "rotation": fields[:, 3:7],
+        "scale": scale,
+        "uuid": uuids,
+        "colourMap": colour_maps,
+        "unknown_value": unknown_values,
+    }
+
+
+def read_assetList(decompressed_data, metadata, version=13):
+    arrays = read_assetList_arrays(decompressed_data, metadata, version)
+
+    uuids = arrays["uuid"].tobytes().hex()
+    return [
+        {
             "position": position,
             "rotation": rotation,
             "scale": scale,
-            "UUID": f_uuid.hex(),
+            "UUID": uuids[index:index + 32],
             "colourMap": colour_map,
             "unknown_value": unknown_value,
-        })
-
-    return objects
+        }
+        for index, position, rotation, scale, colour_map, unknown_value in zip(
+            range(0, len(uuids), 32),
+            zip(*arrays["position"].T.tolist()),  # Columns zipped back up, tuples of python floats like struct gives
+            zip(*arrays["rotation"].T.tolist()),
+            zip(*arrays["scale"].T.tolist()),
+            arrays["colourMap"],
+            arrays["unknown_value"],
+        )
+    ]
 
 
 
@@ -1,71 +1,127 @@
-import struct
+import math
+import functools
 
+import numpy as np
+
+
+# Each vertex is a float32 height followed by a uint32 colour, then the ground map is one int64 per texel
+VERTEX_DTYPE = np.dtype([("height", "<f4"), ("colour", "<u4")])
+GROUND_DTYPE = np.dtype("<i8")
+
+
+@functools.lru_cache(maxsize=1024)
 def infer_dimensions(size):
-    # Total size = (vertex_count * 8) + (ground_count * 8)
-    # Try possible (square) sizes for vertex grid and ground grid
+    # Total size = (vertex_count * 8) + (ground_count * 8), both are square grids and the smallest vertex grid that
+    # fits is used. Only a handful of sizes ever turn up (one per mip level), so each is solved once and cached
+    if size % 8 != 0:
+        raise ValueError(f"Could not infer mip dimensions: size {size} is not a multiple of 8")
 
+    count = size // 8
     for vertex_dim in range(1, 256):
+        ground_count = count - vertex_dim * vertex_dim
+        if ground_count < 0:
+            break
+
+        ground_dim = math.isqrt(ground_count)
+        if ground_dim * ground_dim == ground_count:
+            return vertex_dim, ground_dim
+
+    raise ValueError(f"Could not infer mip dimensions: size {size} does not fit a square vertex and ground grid")
+
+
+class MipChunk:
+    """
+    Decoded mip chunk, dict-like so it reads like the old dict of lists, e.g. chunk["height_map"].
+    The maps are flat numpy arrays: height_map (float32) and color_map (uint32) of vertex_dim^2, ground_map (int64) of
+    ground_dim^2. Assigned maps (arrays of any shape, or lists) are copied in, decoded ones are views over the chunk.
+    """
+    MAP_DTYPES = {"height_map": np.float32, "color_map": np.uint32, "ground_map": np.int64}
+    KEYS = ("vertex_dim", "ground_dim", "height_map", "color_map", "ground_map")
+
+    def __init__(self, vertex_dim, ground_dim, height_map, color_map, ground_map):
+        self.vertex_dim = vertex_dim
+        self.ground_dim = ground_dim
+        self.height_map = np.asarray(height_map, dtype=np.float32).reshape(-1)
+        self.color_map = np.asarray(color_map, dtype=np.uint32).reshape(-1)
+        self.ground_map = np.asarray(ground_map, dtype=np.int64).reshape(-1)
+
+    @classmethod
+    def from_buffer(cls, data, vertex_dim, ground_dim):
+        # Zero-copy views over a raw chunk, writable when it is a bytearray
         wh = vertex_dim * vertex_dim
-        wh_bytes = wh * 8
-        remaining = size - wh_bytes
+        vertices = np.frombuffer(data, dtype=VERTEX_DTYPE, count=wh)
+        ground_map = np.frombuffer(data, dtype=GROUND_DTYPE, count=ground_dim * ground_dim, offset=wh * VERTEX_DTYPE.itemsize)
+        return cls(vertex_dim, ground_dim, vertices["height"], vertices["colour"], ground_map)
 
-        if remaining % 8 != 0:
-            continue
+    def grid(self, key):
+        # 2D (row, column) view of a map
+        dim = self.ground_dim if key == "ground_map" else self.vertex_dim
+        return self[key].reshape((dim, dim))
 
-        ground_count = remaining // 8
-        ground_dim = int(ground_count**0.5)
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
 
-        if ground_dim * ground_dim == ground_count:
-            return vertex_dim, ground_dim
+    def __setitem__(self, key, value):
+        if key not in self.MAP_DTYPES:
+            raise KeyError(f"'{key}' can not be set, only {tuple(self.MAP_DTYPES)}")
 
-    raise ValueError("Could not infer dimensions")
+        value = np.array(value, dtype=self.MAP_DTYPES[key]).reshape(-1)
+        if value.size != self[key].size:
+            raise ValueError(f"'{key}' needs {self[key].size} values, got {value.size}")
+        setattr(self, key, value)
 
-def read_mip(decompressed_data, metadata, version=13):
-    height_map = []
-    color_map = []
-    ground_map = []
+    def __contains__(self, key):
+        return key in self.KEYS
 
-    vertex_dim, ground_dim = infer_dimensions(metadata["size"])
-    wh = vertex_dim * vertex_dim
-    ground_count = ground_dim * ground_dim
-
-    # Read height/color data
-    for i in range(wh):
-        offset = i * 8
-        height = struct.unpack_from("<f", decompressed_data, offset)[0]
-        color = struct.unpack_from("<I", decompressed_data, offset + 4)[0]
-        height_map.append(height)
-        color_map.append(color)
-
-    # Read ground map
-    ground_offset = wh * 8
-    for i in range(ground_count):
-        offset = ground_offset + i * 8
-        val = struct.unpack_from("<q", decompressed_data, offset)[0]
-        ground_map.append(val)
-
-    return {
-        "vertex_dim": vertex_dim,
-        "ground_dim": ground_dim,
-        "height_map": height_map,
-        "color_map": color_map,
-        "ground_map": ground_map,
-    }
+    def __iter__(self):
+        return iter(self.KEYS)
 
+    def __len__(self):
+        return len(self.KEYS)
 
-def write_mip(data, metadata):
-    height_map = data["height_map"]
-    color_map = data["color_map"]
-    ground_map = data["ground_map"]
+    def keys(self):
+        return self.KEYS
+
+    def values(self):
+        return [self[key] for key in self.KEYS]
+
+    def items(self):
+        return [(key, self[key]) for key in self.KEYS]
+
+    def get(self, key, default=None):
+        return self[key] if key in self.KEYS else default
+
+    def to_dict(self):
+        return {key: self[key] for key in self.KEYS}
+
+    def tobytes(self):
+        assert len(self.height_map) == len(self.color_map)
 
-    assert len(height_map) == len(color_map)
+        # One buffer for the whole chunk, the vertices are interleaved into it and the ground map follows
+        vertex_bytes = len(self.height_map) * VERTEX_DTYPE.itemsize
+        full_data = np.empty(vertex_bytes + len(self.ground_map) * GROUND_DTYPE.itemsize, dtype=np.uint8)
 
-    vertex_data = bytearray()
-    for height, color in zip(height_map, color_map):
-        vertex_data += struct.pack("<fI", height, color)  # float32, uint32
+        vertices = full_data[:vertex_bytes].view(VERTEX_DTYPE)
+        vertices["height"] = self.height_map
+        vertices["colour"] = self.color_map
+        full_data[vertex_bytes:].view(GROUND_DTYPE)[:] = self.ground_map
 
-    ground_data = struct.pack(f"<{len(ground_map)}q", *ground_map)  # q = int64
+        return full_data.tobytes()
 
-    full_data = vertex_data + ground_data
+    def __repr__(self):
+        return f"MipChunk(vertex_dim={self.vertex_dim}, ground_dim={self.ground_dim})"
+
+
+def read_mip(decompressed_data, metadata, version=13):
+    vertex_dim, ground_dim = infer_dimensions(metadata["size"])
+    return MipChunk.from_buffer(decompressed_data, vertex_dim, ground_dim)
+
+
+def write_mip(data, metadata):
+    # data is a MipChunk, or a dict of maps (numpy arrays of any shape, or flat lists)
+    if not isinstance(data, MipChunk):
+        data = MipChunk(data.get("vertex_dim"), data.get("ground_dim"), data["height_map"], data["color_map"], data["ground_map"])
 
-    return full_data
+    return data.tobytes()
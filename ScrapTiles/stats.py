@@ -0,0 +1,67 @@
+import json
+import time
+import threading
+
+
+class TileStats:
+    """
+    Opt-in timing / counters for TileFile reads and writes, TileFile(path, stats=True) or stats=TileStats().
+
+    Recorded as [section][phase] -> {"calls", "seconds", "bytes_in", "bytes_out"}, where section is a data type
+    (mip, assets...) or "file" for whole file work. Phases:
+     - read:  "read", "parse_headers", "decompress", "decode", "cache_hit", "load_pool" (waiting on a process pool)
+     - write: "encode", "compress", "copy" (unchanged sub cells), "write", "pack_headers"
+    """
+
+    def __init__(self):
+        self.sections = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {"sections": self.sections}
+
+    def __setstate__(self, state):
+        self.sections = state["sections"]
+        self._lock = threading.Lock()
+
+    def record(self, section, phase, start=None, bytes_in=0, bytes_out=0):
+        # start is a time.perf_counter() value taken before the work, or None to only count the call
+        seconds = 0.0 if start is None else time.perf_counter() - start
+
+        with self._lock:
+            entry = self.sections.setdefault(section, {}).setdefault(phase, {"calls": 0, "seconds": 0.0, "bytes_in": 0, "bytes_out": 0})
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+            entry["bytes_in"] += bytes_in
+            entry["bytes_out"] += bytes_out
+
+    def phase_totals(self):
+        totals = {}
+        for phases in self.sections.values():
+            for phase, entry in phases.items():
+                total = totals.setdefault(phase, {"calls": 0, "seconds": 0.0, "bytes_in": 0, "bytes_out": 0})
+                for key in total:
+                    total[key] += entry[key]
+        return totals
+
+    def merge(self, other):
+        for section, phases in other.sections.items():
+            for phase, entry in phases.items():
+                with self._lock:
+                    total = self.sections.setdefault(section, {}).setdefault(phase, {"calls": 0, "seconds": 0.0, "bytes_in": 0, "bytes_out": 0})
+                    for key in total:
+                        total[key] += entry[key]
+
+    def reset(self):
+        with self._lock:
+            self.sections = {}
+
+    def to_dict(self):
+        return {"sections": self.sections, "totals": self.phase_totals()}
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def dump(self, file_path):
+        with open(file_path, "w") as f:
+            f.write(self.to_json())
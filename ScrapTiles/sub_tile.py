@@ -1,17 +1,148 @@
+import time
+import logging
+import lz4.block
+
+
+logger = logging.getLogger(__name__)
+
 
 class SubCellData:
-    def __init__(self, data_type: str, data, meta_data, version):
+    def __init__(self, data_type: str, data, meta_data, version, compressed_data=None, decode_func=None, cache=None, stats=None):
         self.type = data_type
-        self.original_data = data
         self.version = version
-
-        self.data = None
         self.meta_data = meta_data
 
+        # Compressed bytes as found in the source file. Only set for sub cells read from a tile, and used to
+        # decompress / decode the sub cell the first time it is accessed.
+        self.compressed_data = compressed_data
+        self.decode_func = decode_func
+        self.cache = cache  # Optional DecodeCache, skips decompressing / decoding chunks that were seen before
+        self.stats = stats  # Optional TileStats
+
+        self._original_data = data
+        self._data = None
+        self._decoded = False
+        self._dirty = False
+
+    @property
+    def loaded(self):
+        return self._decoded or self._original_data is not None or self.compressed_data is None
+
+    @property
+    def dirty(self):
+        # Sub cells without source bytes (newly created ones) always have to be encoded
+        return self._dirty or self.compressed_data is None
+
+    def mark_dirty(self):
+        self._dirty = True
+
+    def mark_clean(self, compressed_data, index, size):
+        # Called once the sub cell has been written, compressed_data is now what is on disk
+        self.compressed_data = compressed_data
+        self.meta_data["index"] = index
+        self.meta_data["compressed"] = len(compressed_data)
+        self.meta_data["size"] = size
+        self._dirty = False
+
+    def unload(self):
+        # Drops the decompressed / decoded data of a clean sub cell, it is decompressed / decoded again when next accessed
+        if self.compressed_data is None or self._dirty:
+            return
+
+        self._original_data = None
+        self._data = None
+        self._decoded = False
+
+    @property
+    def original_data(self):
+        if self._original_data is None and self.compressed_data is not None:
+            self._original_data = self.decompress()
+        return self._original_data
+
+    @original_data.setter
+    def original_data(self, value):
+        self._original_data = value
+        self._dirty = True
+
+    @property
+    def data(self):
+        if not self._decoded and self.decode_func is not None:
+            self.decode(self.decode_func)
+
+        # The decoded data is mutable, so anything handed out may be edited in place
+        self._dirty = True
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._decoded = True
+        self._dirty = True
+
+    def set_loaded(self, original_data, data):
+        # Used when the decompression / decoding happened elsewhere (e.g. a worker process), does not dirty the sub cell
+        self._original_data = original_data
+        if self.decode_func is not None:
+            self._data = data
+            self._decoded = True
+
+    def decompress(self):
+        start = time.perf_counter()
+        try:
+            # A bytearray, so the numpy views the codecs hand out over it are writable
+            decompressed_data = lz4.block.decompress(self.compressed_data, uncompressed_size=self.meta_data["size"], return_bytearray=True)
+        except:
+            logger.error(
+                "Error decompressing data (index: %s, size: %s, compressed: %s, type: %s)",
+                self.meta_data["index"], self.meta_data["size"], self.meta_data["compressed"], self.type
+            )
+            raise
+
+        if self.stats is not None:
+            self.stats.record(self.type, "decompress", start, len(self.compressed_data), len(decompressed_data))
+
+        return decompressed_data
+
+    def load(self):
+        # Force the lazy sub cell to be decompressed and decoded now
+        if self.decode_func is not None:
+            self.decode(self.decode_func)
+        elif self._original_data is None and self.compressed_data is not None:
+            self._original_data = self.decompress()
+        return self
+
     def decode(self, decode_func):
-        self.data = decode_func(self.original_data, self.meta_data, self.version)
+        key = None
+        if self.cache is not None and self.type in self.cache.DATA_TYPES and self.compressed_data is not None and self._original_data is None:
+            start = time.perf_counter()
+            key = self.cache.key(self, decode_func)
+            data = self.cache.get(key)
+
+            if data is not self.cache.MISS:
+                if self.stats is not None:
+                    self.stats.record(self.type, "cache_hit", start, len(self.compressed_data))
+
+                self._data = data
+                self._decoded = True
+                return
+
+        original_data = self.original_data
+
+        start = time.perf_counter()
+        self._data = decode_func(original_data, self.meta_data, self.version)
+        self._decoded = True
+
+        if self.stats is not None:
+            self.stats.record(self.type, "decode", start, len(original_data))
+
+        if key is not None:
+            self.cache.put(key, self._data)
 
     def encode(self, encode_func=None):
         if not encode_func:
             return self.original_data
-        return encode_func(self.data, self.meta_data)
+
+        # Not through self.data, encoding a sub cell must not mark it dirty
+        if not self._decoded and self.decode_func is not None:
+            self.decode(self.decode_func)
+        return encode_func(self._data, self.meta_data)
@@ -1,32 +1,63 @@
+import os
+import time
 import struct
-import lz4.block
+import mmap
+import asyncio
+import weakref
+import logging
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 from .sub_tile import SubCellData
+from .cell_header import CELL_HEADER_DTYPE, CellHeader, read_cell_header_table
+from .info import TileInfo
+from .compression import Compressor
+from .progress import ProgressReporter
+from .stats import TileStats
 
 from .readwrite import mip
 from .readwrite import assetList
 
 
-class bcolors:
-    HEADER = '\033[95m'
-    GOOD = '\033[92m'
-    BLUE = '\033[94m'
-    ERROR = '\033[91m'
-    WARNING = '\033[93m'
-    ENDC = '\033[0m'
+logger = logging.getLogger(__name__)
+
+
+def _load_sub_cell_job(job):
+    # Runs inside a worker process, so everything in and out has to be picklable
+    sub_cell = SubCellData(*job).load()
+    return sub_cell._original_data, sub_cell._data
 
 
 class TileFile:
     MAGIC_KEY = 0x454C4954  # "TILE"
-    CELL_HEADER_SIZE = 97
+    HEADER_FORMAT = "<I I 16s Q I I I I I I I"
+    HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
     CELL_DATA_SIZE = 388
+    ASYNC_CONCURRENCY = 4  # Max number of open_async / write_file_async calls running at once per event loop
+    CELL_WORLD_SIZE = 65  # Size of a cell in world units, as used by the asset modifier
+    CELL_FORMAT = "<6i 6i 6i i i i 4i 4i 4i 4i i i i i i i i i i i i i i i i i i i i i 4i 4i 4i 4i 4i 4i 4i 4i 4i i i i i"
 
-    def __init__(self, file_path):
+    def __init__(self, file_path, lazy=False, use_mmap=False, workers=None, executor="thread", sections=None, mip_levels=None, region=None, region_units="cell", cache=None, progress=None, stats=None):
         self.file_path = file_path
+        self.lazy = lazy  # Only decompress / decode sub cells when they are first accessed
+        self.sections = sections  # Data types to load up front (None for all), the rest stay compressed until accessed
+        self.mip_levels = mip_levels  # Mip levels to load up front (None for all)
+        self.region = region  # (x1, y1, x2, y2) of the cells to load up front (None for all), in region_units
+        self.region_units = region_units  # "cell" or "world"
+        self.cache = cache  # Optional cache.DecodeCache of decoded sub cells
+        self.progress = progress  # Optional callback(phase, done, total), return False to cancel. See progress.py
+        self.stats = TileStats() if stats is True else (stats or None)  # Optional per phase timings / counters, see stats.py
+        self.use_mmap = use_mmap  # Map the file instead of reading it, chunks are then memoryview slices of the map
+        self.workers = workers  # Number of workers used to decompress / decode sub cells, None or 1 is serial
+        self.executor = executor  # "thread" or "process", processes help when the python codecs are the bottleneck
         self.header = None
-        self.cell_headers = []
+        self.cell_headers = []  # Dict-like views into self.cell_header_table
+        self.cell_header_table = None  # Numpy structured array, one record per cell
         self.world_data = []  # [cell_index][data_type][index]
         self.original_data = None  # Store the original file data for reconstruction
+        self._mmap = None
+        self.last_write_report = None  # What write_file did per data type (compression used, sizes, time)
 
         self.read_write_functions = {
             "mip": (mip.read_mip, mip.write_mip),
@@ -36,16 +67,28 @@ class TileFile:
         if self.file_path:
             self.read_file()
 
-    def read_file(self, raw_input_bytes: bytes | bytearray | None =None):
+    def read_file(self, raw_input_bytes: bytes | bytearray | None =None, sections=None, mip_levels=None):
+        if sections is None:
+            sections = self.sections
+        if mip_levels is None:
+            mip_levels = self.mip_levels
+
+        start = time.perf_counter()
         if not raw_input_bytes:
-            with open(self.file_path, "rb") as f:
-                self.original_data = f.read()
+            self.read_source()
         else:
             self.original_data = raw_input_bytes
 
+        if self.stats is not None:
+            self.stats.record("file", "read", start, bytes_out=0 if self.use_mmap else len(self.original_data))
+
+        start = time.perf_counter()
         self.parse_header(self.original_data)
         self.parse_cell_headers(self.original_data)
 
+        if self.stats is not None:
+            self.stats.record("file", "parse_headers", start, self.cell_header_table.nbytes)
+
         for index, cell_header in enumerate(self.cell_headers):
             cell_header_data = {}
             for data_type in cell_header:
@@ -55,16 +98,193 @@ class TileFile:
 
                 else:
                     if index == 0:
-                        print(f"{bcolors.WARNING}[WARN] Modification disabled | No Read/Write functions for '{data_type}'{bcolors.ENDC}")
+                        logger.debug("Modification disabled | No Read/Write functions for '%s'", data_type)
 
                     cell_data = self.decode_cell_chunk(self.original_data, cell_header, data_type, None)
 
                 cell_header_data[data_type] = cell_data
             self.world_data.append(cell_header_data)
 
-        print(f"{bcolors.GOOD}[INFO] Loaded Tile. The following attributes are editable: {bcolors.ENDC}")
-        for read_write in self.read_write_functions:
-            print(f"{bcolors.GOOD} - {read_write}{bcolors.ENDC}")
+        if not self.lazy:
+            cells = None if self.region is None else self.cells_in_region(*self.region, units=self.region_units)
+            self.load_sub_cells(list(self.select_sub_cells(sections, mip_levels, cells)))
+
+        logger.info("Loaded Tile '%s'. The following attributes are editable: %s", self.file_path, ", ".join(self.read_write_functions))
+
+    def read_source(self):
+        # Reads (or maps) the source file into self.original_data, which the sub cells' chunks are sliced from
+        with open(self.file_path, "rb") as f:
+            if self.use_mmap:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self.original_data = memoryview(self._mmap)
+            else:
+                self.original_data = f.read()
+
+    _async_limits = weakref.WeakKeyDictionary()  # [event loop] -> asyncio.Semaphore
+
+    @classmethod
+    def _async_limit(cls):
+        loop = asyncio.get_running_loop()
+        if loop not in cls._async_limits:
+            cls._async_limits[loop] = asyncio.Semaphore(cls.ASYNC_CONCURRENCY)
+        return cls._async_limits[loop]
+
+    @classmethod
+    async def open_async(cls, file_path, loop_executor=None, **kwargs):
+        # File IO, decompression and decoding all run in loop_executor (the loop's default one if None). The rest of
+        # kwargs go to TileFile, including its own executor= option
+        async with cls._async_limit():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(loop_executor, functools.partial(cls, file_path, **kwargs))
+
+    async def write_file_async(self, output_file_path, loop_executor=None, **kwargs):
+        async with self._async_limit():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(loop_executor, functools.partial(self.write_file, output_file_path, **kwargs))
+
+    @classmethod
+    def stat(cls, file_path):
+        # Only reads the file header and cell header table, nothing is decompressed
+        tile = cls(None)
+        tile.file_path = file_path
+
+        with open(file_path, "rb") as f:
+            tile.parse_header(f.read(cls.HEADER_SIZE))
+
+            cell_count = tile.header["width"] * tile.header["height"]
+            f.seek(tile.header["cell_header_offset"])
+            table_data = f.read(cls.CELL_DATA_SIZE * cell_count)
+
+            file_size = f.seek(0, os.SEEK_END)
+
+        tile.parse_cell_headers(table_data, offset=0)
+
+        return TileInfo(file_path, tile.header, tile.cell_header_table, file_size)
+
+    def iter_sub_cells(self):
+        for cell in self.world_data:
+            for sub_cells in cell.values():
+                for sub_cell in sub_cells:
+                    if type(sub_cell) is not tuple:
+                        yield sub_cell
+
+    def cells_in_region(self, x1, y1, x2, y2, units="cell"):
+        # Inclusive bounds, cells are indexed as cell_y * width + cell_x
+        if units == "world":
+            x1, y1, x2, y2 = (int(value // self.CELL_WORLD_SIZE) for value in (x1, y1, x2, y2))
+        elif units != "cell":
+            raise ValueError(f"Unknown units '{units}', expected 'cell' or 'world'")
+
+        x1, x2 = sorted((x1, x2))
+        y1, y2 = sorted((y1, y2))
+
+        width, height = self.header["width"], self.header["height"]
+        return [
+            cell_y * width + cell_x
+            for cell_y in range(max(0, y1), min(height - 1, y2) + 1)
+            for cell_x in range(max(0, x1), min(width - 1, x2) + 1)
+        ]
+
+    def load_region(self, x1, y1, x2, y2, units="cell", sections=None, mip_levels=None):
+        # Decompress / decode the cells in the region, returns the indexes of those cells
+        cells = self.cells_in_region(x1, y1, x2, y2, units)
+        self.load_sub_cells(list(self.select_sub_cells(sections, mip_levels, cells)))
+        return cells
+
+    def select_sub_cells(self, sections=None, mip_levels=None, cells=None):
+        if sections is not None:
+            unknown = set(sections) - set(CELL_HEADER_DTYPE.names)
+            if unknown:
+                raise ValueError(f"Unknown sections {sorted(unknown)}")
+
+        if cells is None:
+            cells = range(len(self.world_data))
+
+        for cell_index in cells:
+            for data_type, sub_cells in self.world_data[cell_index].items():
+                if sections is not None and data_type not in sections:
+                    continue
+
+                for level, sub_cell in enumerate(sub_cells):
+                    if type(sub_cell) is tuple:
+                        continue
+
+                    if data_type == "mip" and mip_levels is not None and level not in mip_levels:
+                        continue
+
+                    yield sub_cell
+
+    def load_sub_cells(self, sub_cells, progress=None):
+        progress = ProgressReporter(progress or self.progress)
+        total = len(sub_cells)
+        progress.update("load", 0, total)
+
+        if not self.workers or self.workers <= 1 or len(sub_cells) <= 1:
+            for done, sub_cell in enumerate(sub_cells, 1):
+                sub_cell.load()
+                progress.update("load", done, total)
+
+        elif self.executor == "process":
+            jobs = [
+                (sub_cell.type, None, sub_cell.meta_data, sub_cell.version, bytes(sub_cell.compressed_data), sub_cell.decode_func, sub_cell.cache)
+                for sub_cell in sub_cells
+            ]
+            chunk_size = max(1, len(jobs) // (self.workers * 4))
+
+            # Worker processes can't record into self.stats, so only the overall time is recorded
+            start = time.perf_counter()
+            with ProcessPoolExecutor(self.workers) as pool:
+                try:
+                    results = pool.map(_load_sub_cell_job, jobs, chunksize=chunk_size)
+                    for done, (sub_cell, (original_data, data)) in enumerate(zip(sub_cells, results), 1):
+                        sub_cell.set_loaded(original_data, data)
+                        progress.update("load", done, total)
+                except BaseException:
+                    pool.shutdown(cancel_futures=True)
+                    raise
+
+            if self.stats is not None:
+                self.stats.record("file", "load_pool", start, sum(len(job[4]) for job in jobs))
+
+        elif self.executor == "thread":
+            # lz4 releases the GIL while decompressing, so threads scale for the decompression part
+            with ThreadPoolExecutor(self.workers) as pool:
+                try:
+                    for done, _ in enumerate(pool.map(SubCellData.load, sub_cells), 1):
+                        progress.update("load", done, total)
+                except BaseException:
+                    pool.shutdown(cancel_futures=True)
+                    raise
+
+        else:
+            raise ValueError(f"Unknown executor '{self.executor}', expected 'thread' or 'process'")
+
+    def close(self, detach=False):
+        # Only needed for mmap backed tiles. Chunks still pointing into the map are released, so sub cells that weren't
+        # loaded can't be read (or copied into a save) afterwards. detach=True keeps the tile usable instead, by copying
+        # those chunks into memory first
+        if self._mmap is None:
+            return
+
+        for sub_cell in self.iter_sub_cells():
+            if type(sub_cell.compressed_data) is memoryview:
+                view = sub_cell.compressed_data
+                if detach:
+                    sub_cell.compressed_data = bytes(view)
+                view.release()
+
+        self.original_data.release()
+        self.original_data = None
+
+        self._mmap.close()
+        self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
 
     @staticmethod
     def decode_colour(colour):
@@ -76,8 +296,7 @@ class TileFile:
         return red, green, blue, alpha
 
     def parse_header(self, data):
-        header_format = "<I I 16s Q I I I I I I I"
-        unpacked = struct.unpack_from(header_format, data, 0)
+        unpacked = struct.unpack_from(self.HEADER_FORMAT, data, 0)
 
         magic_key, version, uuid, creator_id, width, height, cell_header_offset, cell_header_size, some_val1, some_val2, v_type = unpacked
 
@@ -97,109 +316,26 @@ class TileFile:
             "type": v_type,
         }
 
-        print(f"{bcolors.GOOD}[INFO] Parsed Header. Tile Version: {version}{bcolors.ENDC}")
+        logger.debug("Parsed Header. Tile Version: %s", version)
 
-    def parse_cell_headers(self, data):
-        offset = self.header["cell_header_offset"]
+    def parse_cell_headers(self, data, offset=None):
+        if offset is None:
+            offset = self.header["cell_header_offset"]
         cell_size = self.header["cell_header_size"]
         cell_count = self.header["width"] * self.header["height"]
 
-        for _ in range(cell_count):
-            cell_data = data[offset:offset + cell_size]
-            cell_header = self.parse_cell_header(cell_data)
-            self.cell_headers.append(cell_header)
-            offset += cell_size
+        if cell_size != self.CELL_DATA_SIZE:
+            raise ValueError(f"Invalid .tile file: Cell Header size mismatch ({cell_size} / {self.CELL_DATA_SIZE})")
 
-    def parse_cell_header(self, cell_data):
-        cell_format = "<6i 6i 6i i i i 4i 4i 4i 4i i i i i i i i i i i i i i i i i i i i i 4i 4i 4i 4i 4i 4i 4i 4i 4i i i i i"
-        unpacked = struct.unpack(cell_format, cell_data)
+        # The whole table is read in one go, self.cell_headers are dict-like views into it
+        self.cell_header_table = read_cell_header_table(data, offset, cell_count)
+        self.cell_headers = [CellHeader(self.cell_header_table, index) for index in range(cell_count)]
 
-        if len(unpacked) != self.CELL_HEADER_SIZE:
+    def parse_cell_header(self, cell_data):
+        if len(cell_data) != self.CELL_DATA_SIZE:
             raise ValueError("Invalid .tile file: Cell Header size mismatch")
 
-        return {
-            "mip": {  # 6x (no count)
-                "index": unpacked[0:6],
-                "compressed": unpacked[6:12],
-                "size": unpacked[12:18],
-            },
-
-            "clutter": {  # 1x (no count)
-                "index": unpacked[18],
-                "compressed": unpacked[19],
-                "size": unpacked[20],
-            },
-
-            "assets": {  # 4x
-                "count": unpacked[21:25],
-                "index": unpacked[25:29],
-                "compressed": unpacked[29:33],
-                "size": unpacked[33:37],
-            },
-
-            "blueprint": {  # 1x
-                "count": unpacked[37],
-                "index": unpacked[38],
-                "compressed": unpacked[39],
-                "size": unpacked[40],
-            },
-
-            "node": {
-                "count": unpacked[41],
-                "index": unpacked[42],
-                "compressed": unpacked[43],
-                "size": unpacked[44],
-            },
-
-            "script": {
-                "count": unpacked[45],
-                "index": unpacked[46],
-                "compressed": unpacked[47],
-                "size": unpacked[48],
-            },
-
-            "prefab": {
-                "count": unpacked[49],
-                "index": unpacked[50],
-                "compressed": unpacked[51],
-                "size": unpacked[52],
-            },
-
-            "decal": {
-                "count": unpacked[53],
-                "index": unpacked[54],
-                "compressed": unpacked[55],
-                "size": unpacked[56],
-            },
-
-            "harvestable": {
-                "count": unpacked[57:61],
-                "index": unpacked[61:65],
-                "compressed": unpacked[65:69],
-                "size": unpacked[69:73],
-            },
-
-            "kinematics": {
-                "count": unpacked[73:77],
-                "index": unpacked[77:81],
-                "compressed": unpacked[81:85],
-                "size": unpacked[85:89],
-            },
-
-            "unknown": {
-                "count": unpacked[89],
-                "index": unpacked[90],
-                "compressed": unpacked[91],
-                "size": unpacked[92],
-            },
-
-            "voxel_terrain": {
-                "count": unpacked[93],
-                "index": unpacked[94],
-                "compressed": unpacked[95],
-                "size": unpacked[96],
-            }
-        }
+        return CellHeader(read_cell_header_table(cell_data, 0, 1), 0)
 
     def _decode_cell_chunk(self, data, index, size, compressed, count, header_name, parse_function):
         if index <= 0 or compressed <= 0:
@@ -207,32 +343,20 @@ class TileFile:
 
         compressed_data = data[index:index + compressed]
 
-        try:
-
-            decompressed_data = lz4.block.decompress(compressed_data, uncompressed_size=size)
-        except:
-            print("Error decompressing data", index, size, compressed, header_name)
-            raise
-
         meta = {"index": index, "compressed": compressed, "size": size, "count": count}
-        sub_cell = SubCellData(header_name, decompressed_data, meta, self.header["version"])
-
-        if parse_function is not None:
-            sub_cell.decode(parse_function)
-
-        return sub_cell
+        return SubCellData(header_name, None, meta, self.header["version"], compressed_data, parse_function, self.cache, self.stats)
 
     def decode_cell_chunk(self, data, cell_header, header_name, parse_function=None):
         cell_header_data = cell_header[header_name]
 
         sub_cells = []
 
-        if type(cell_header_data["index"]) is tuple:
+        if cell_header_data.multiple:
             for level in range(len(cell_header_data["index"])):
-                index = cell_header_data["index"][level]
-                size = cell_header_data["size"][level]
-                compressed_size = cell_header_data["compressed"][level]
-                count = None if "count" not in cell_header_data else cell_header_data["count"][level]
+                index = int(cell_header_data["index"][level])
+                size = int(cell_header_data["size"][level])
+                compressed_size = int(cell_header_data["compressed"][level])
+                count = None if "count" not in cell_header_data else int(cell_header_data["count"][level])
 
                 sub_cells.append(
                     self._decode_cell_chunk(data, index, size, compressed_size, count, header_name, parse_function)
@@ -265,8 +389,8 @@ class TileFile:
         return new_data
 
     @staticmethod
-    def create_cell_header(header):
-        cell_data = [
+    def cell_header_values(header):
+        return [
             header["mip"]["index"][0], header["mip"]["index"][1], header["mip"]["index"][2], header["mip"]["index"][3], header["mip"]["index"][4], header["mip"]["index"][5],
             header["mip"]["compressed"][0], header["mip"]["compressed"][1], header["mip"]["compressed"][2], header["mip"]["compressed"][3], header["mip"]["compressed"][4], header["mip"]["compressed"][5],
             header["mip"]["size"][0], header["mip"]["size"][1], header["mip"]["size"][2], header["mip"]["size"][3], header["mip"]["size"][4], header["mip"]["size"][5],
@@ -326,104 +450,284 @@ class TileFile:
             header["voxel_terrain"]["size"]
         ]
 
-        cell_format = "<6i 6i 6i i i i 4i 4i 4i 4i i i i i i i i i i i i i i i i i i i i i 4i 4i 4i 4i 4i 4i 4i 4i 4i i i i i"
-        return struct.pack(cell_format, *cell_data)
+    @classmethod
+    def create_cell_header(cls, header):
+        return struct.pack(cls.CELL_FORMAT, *cls.cell_header_values(header))
 
-    def write_file(self, output_file_path):
-        print(f"{bcolors.GOOD}[INFO] Creating Tile Header... {bcolors.ENDC}", end="")
-        new_data = self.write_header(b"")
+    def encode_sub_cell(self, sub_cell, recompress=False, compressor=None):
+        if compressor is None:
+            compressor = Compressor()
 
-        if len(new_data) != self.header["cell_header_offset"]:
-            raise ValueError("Header offset is incorrect, I have no setup for this :)")
+        # Untouched sub cells are copied across as they are, without decoding or recompressing them
+        if not recompress and not sub_cell.dirty:
+            compressor.record(sub_cell.type, "copied", sub_cell.meta_data["size"], len(sub_cell.compressed_data))
 
-        sub_cell_count = 0
-        for i, _ in enumerate(self.cell_headers):
-            for j in self.world_data[i]:
-                for _ in self.world_data[i][j]:
-                    sub_cell_count += 1
+            if self.stats is not None:
+                self.stats.record(sub_cell.type, "copy", None, len(sub_cell.compressed_data), len(sub_cell.compressed_data))
 
-        print(f"\r{bcolors.GOOD}[INFO] Blocking Space... {bcolors.ENDC}", end="")
+            return sub_cell.meta_data["size"], sub_cell.compressed_data
 
-        # block out cell header space
-        new_data += ("X" * (self.CELL_DATA_SIZE * len(self.cell_headers))).encode()
+        encode_func = None
+        if sub_cell.type in self.read_write_functions:
+            encode_func = self.read_write_functions[sub_cell.type][1]
 
-        data_blob_offset = len(new_data)
-        data_blob = b""
+        start = time.perf_counter()
+        loaded = sub_cell.loaded
+        raw_sub_cell_data = sub_cell.encode(encode_func)
 
-        sub_cells_processed = 0
-        print(f"\r{bcolors.GOOD}[INFO] Processing... (0/{sub_cell_count}){bcolors.ENDC}", end="")
-        for cell_index, cell_header in enumerate(self.cell_headers):
-            for data_type in self.world_data[cell_index]:
-                for sub_cell_index, sub_cell in enumerate(self.world_data[cell_index][data_type]):
-                    if type(sub_cell) is not tuple:
-                        multiple_sub_cells = type(cell_header[data_type]["index"]) is not int
+        if not loaded:
+            # Only loaded to be saved, dropped again so saving a lazy tile doesn't end up holding all of it in memory
+            sub_cell.unload()
+
+        if self.stats is not None:
+            self.stats.record(sub_cell.type, "encode", start, bytes_out=len(raw_sub_cell_data))
+
+        start = time.perf_counter()
+        compressed_cell_data = compressor.compress(sub_cell.type, raw_sub_cell_data)
+
+        if self.stats is not None:
+            self.stats.record(sub_cell.type, "compress", start, len(raw_sub_cell_data), len(compressed_cell_data))
+
+        return len(raw_sub_cell_data), compressed_cell_data
+
+    def iter_encoded_sub_cells(self, sub_cells, workers=None, recompress=False, compressor=None):
+        if compressor is None:
+            compressor = Compressor()
+
+        if not workers or workers <= 1:
+            for sub_cell in sub_cells:
+                yield self.encode_sub_cell(sub_cell, recompress, compressor)
+            return
+
+        # lz4 releases the GIL while compressing. Only a small window of sub cells is in flight at once,
+        # and results are handed back in sub cell order
+        with ThreadPoolExecutor(workers) as pool:
+            pending = deque()
+            for sub_cell in sub_cells:
+                pending.append(pool.submit(self.encode_sub_cell, sub_cell, recompress, compressor))
+
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
 
-                        encode_func = None
-                        if data_type in self.read_write_functions:
-                            encode_func = self.read_write_functions[data_type][1]
+            while pending:
+                yield pending.popleft().result()
 
-                        raw_sub_cell_data = sub_cell.encode(encode_func)
-                        compressed_cell_data = lz4.block.compress(raw_sub_cell_data, mode="high_compression", store_size=False)
+    def encode_sub_cells(self, sub_cells, workers=None, recompress=False, compressor=None):
+        return list(self.iter_encoded_sub_cells(sub_cells, workers, recompress, compressor))
 
-                        if multiple_sub_cells:
-                            if type(cell_header[data_type]["index"]) is tuple:
-                                cell_header[data_type]["index"] = list(cell_header[data_type]["index"])
+    @staticmethod
+    def update_cell_header(section, sub_cell_index, sub_cell, index, compressed_size, size):
+        if section.multiple:
+            if "count" in section:
+                section["count"][sub_cell_index] = sub_cell.meta_data["count"]
+
+            section["index"][sub_cell_index] = index
+            section["compressed"][sub_cell_index] = compressed_size
+            section["size"][sub_cell_index] = size
+
+        else:
+            section["index"] = index
+            section["compressed"] = compressed_size
+            section["size"] = size
+
+            if "count" in section:
+                section["count"] = sub_cell.meta_data["count"]
+
+    def save_incremental(self, output_file_path=None, compression="hc", progress=None):
+        # Appends only the dirty sub cells to the end of the source file, and patches the cell headers that point
+        # to them in place. The old chunks are left behind as dead bytes, use compact() to get rid of them
+        if output_file_path is None:
+            output_file_path = self.file_path
+
+        if not self.file_path or not os.path.exists(output_file_path) or not os.path.samefile(output_file_path, self.file_path):
+            raise ValueError("Incremental saves can only be made to the file the tile was loaded from")
+
+        dirty = [
+            (cell_index, data_type, sub_cell_index, sub_cell)
+            for cell_index, cell in enumerate(self.world_data)
+            for data_type, sub_cells in cell.items()
+            for sub_cell_index, sub_cell in enumerate(sub_cells)
+            if type(sub_cell) is not tuple and sub_cell.dirty
+        ]
+
+        compressor = Compressor(compression, None, sum(sub_cell.meta_data["size"] for *_, sub_cell in dirty))
+        progress = ProgressReporter(progress or self.progress)
+        changed_cells = set()
+
+        # As in write_file the new offsets go in a copy of the cell header table, and only become the tile's own (with the
+        # sub cells marked clean) once every chunk and patched header is on disk
+        cell_header_table = self.cell_header_table.copy()
+        written = []  # (sub_cell, compressed data, index, size)
+
+        with open(output_file_path, "r+b") as f:
+            end = offset = f.seek(0, os.SEEK_END)
+
+            try:
+                for done, (cell_index, data_type, sub_cell_index, sub_cell) in enumerate(dirty):
+                    progress.update("write", done, len(dirty))
+                    raw_size, compressed_cell_data = self.encode_sub_cell(sub_cell, True, compressor)
 
-                            if type(cell_header[data_type]["compressed"]) is tuple:
-                                cell_header[data_type]["compressed"] = list(cell_header[data_type]["compressed"])
+                    f.write(compressed_cell_data)
+                    self.update_cell_header(
+                        CellHeader(cell_header_table, cell_index)[data_type], sub_cell_index, sub_cell,
+                        offset, len(compressed_cell_data), raw_size
+                    )
+                    written.append((sub_cell, compressed_cell_data, offset, raw_size))
 
-                            if type(cell_header[data_type]["size"]) is tuple:
-                                cell_header[data_type]["size"] = list(cell_header[data_type]["size"])
+                    offset += len(compressed_cell_data)
+                    changed_cells.add(cell_index)
 
-                            if "count" in cell_header[data_type]:
-                                if type(cell_header[data_type]["count"]):
-                                    cell_header[data_type]["count"] = list(cell_header[data_type]["count"])
+                for cell_index in sorted(changed_cells):
+                    f.seek(self.header["cell_header_offset"] + self.CELL_DATA_SIZE * cell_index)
+                    f.write(cell_header_table[cell_index].tobytes())
 
-                                cell_header[data_type]["count"][sub_cell_index] = sub_cell.meta_data["count"]
+                f.flush()
 
+            except BaseException:
+                # Failed or cancelled, the original cell headers are put back and the appended chunks cut off again
+                for cell_index in sorted(changed_cells):
+                    f.seek(self.header["cell_header_offset"] + self.CELL_DATA_SIZE * cell_index)
+                    f.write(self.cell_header_table[cell_index].tobytes())
 
-                            cell_header[data_type]["index"][sub_cell_index] = len(data_blob) + data_blob_offset
-                            cell_header[data_type]["compressed"][sub_cell_index] = len(compressed_cell_data)
-                            cell_header[data_type]["size"][sub_cell_index] = len(raw_sub_cell_data)
+                f.truncate(end)
+                raise
 
-                        else:
-                            cell_header[data_type]["index"] = len(data_blob) + data_blob_offset
-                            cell_header[data_type]["compressed"] = len(compressed_cell_data)
-                            cell_header[data_type]["size"] = len(raw_sub_cell_data)
+        self.cell_header_table[:] = cell_header_table  # Copied into, so existing cell_headers views stay valid
+        for sub_cell, compressed_cell_data, index, size in written:
+            sub_cell.mark_clean(compressed_cell_data, index, size)
 
-                            if "count" in cell_header[data_type]:
-                                cell_header[data_type]["count"] = sub_cell.meta_data["count"]
+        progress.update("write", len(dirty), len(dirty))
+        logger.info("Saved %d changed sub cells (%d cells) to '%s'", len(dirty), len(changed_cells), output_file_path)
 
-                        data_blob += compressed_cell_data
+        self.last_write_report = compressor.report
+        return compressor.report
 
-                    sub_cells_processed += 1
+    def compact(self, output_file_path=None, **kwargs):
+        # Rewrites the whole file, dropping the dead bytes left by incremental saves
+        return self.write_file(output_file_path or self.file_path, **kwargs)
 
-            header_data = self.create_cell_header(cell_header)
+    def is_mapped_file(self, file_path):
+        if self._mmap is None or not os.path.exists(file_path):
+            return False
+        return os.path.samefile(file_path, self.file_path)
 
-            if len(header_data) != self.CELL_DATA_SIZE:
-                raise ValueError(f"Header data is invalid size! ({len(header_data)}) / ({self.CELL_DATA_SIZE}) ")
+    def write_file(self, output_file_path, workers=None, recompress=False, compression="hc", time_budget=None, progress=None):
+        if workers is None:
+            workers = self.workers
 
+        progress = ProgressReporter(progress or self.progress)
+        header_data = self.write_header(b"")
 
-            start = self.header["cell_header_offset"] + (self.CELL_DATA_SIZE * cell_index)
-            end = (start + self.CELL_DATA_SIZE)
+        if len(header_data) != self.header["cell_header_offset"]:
+            raise ValueError("Header offset is incorrect, I have no setup for this :)")
 
-            if len(header_data) != end - start:
-                raise ValueError(f"Header Data Does not match the cell size {len(header_data)}/{end - start}")
+        sub_cell_count = 0
+        for i, _ in enumerate(self.cell_headers):
+            for j in self.world_data[i]:
+                for _ in self.world_data[i][j]:
+                    sub_cell_count += 1
+
+        # The new file's offsets go in a copy of the cell header table, filled in as each chunk is written and written last.
+        # They only become the tile's own when the source file itself was replaced
+        in_place = bool(self.file_path) and os.path.exists(output_file_path) and os.path.samefile(output_file_path, self.file_path)
+        cell_header_table = self.cell_header_table.copy()
+        cell_headers = [CellHeader(cell_header_table, index) for index in range(len(cell_header_table))]
+        written = []  # (sub_cell, index, compressed size, size), marked clean after an in place save
+        closed = False
 
-            if end > len(new_data):
-                raise ValueError(f"Invalid Header Index (Out of bounds). Index: {end}, Max: {len(new_data)}")
+        data_blob_offset = len(header_data) + self.CELL_DATA_SIZE * len(self.cell_headers)
+        data_blob_size = 0
 
-            new_data = new_data[:start] + header_data + new_data[end:]
+        sub_cells = list(self.iter_sub_cells())
+        compressor = Compressor(compression, time_budget, sum(
+            sub_cell.meta_data["size"] for sub_cell in sub_cells if recompress or sub_cell.dirty
+        ))
 
-            print(f"\r{bcolors.GOOD}[INFO] Processing... ({sub_cells_processed}/{sub_cell_count}){bcolors.ENDC}", end="")
+        # Sub cells are compressed (possibly in parallel) while the file is being written, offsets are handed out in order
+        encoded_sub_cells = self.iter_encoded_sub_cells(sub_cells, workers, recompress, compressor)
 
+        # Always written next to the output and swapped in once complete. The output may be the source file (and unchanged
+        # chunks may still point into it), so it is never truncated, and a failed save leaves it as it was
+        write_path = output_file_path + ".tmp"
 
-        new_data += data_blob
+        try:
+            with open(write_path, "wb") as f:
+                f.write(header_data)
+                f.seek(data_blob_offset)
+
+                sub_cells_processed = 0
+                progress.update("write", 0, sub_cell_count)
+                for cell_index, cell_header in enumerate(cell_headers):
+                    for data_type in self.world_data[cell_index]:
+                        for sub_cell_index, sub_cell in enumerate(self.world_data[cell_index][data_type]):
+                            if type(sub_cell) is not tuple:
+                                raw_size, compressed_cell_data = next(encoded_sub_cells)
+
+                                self.update_cell_header(
+                                    cell_header[data_type], sub_cell_index, sub_cell,
+                                    data_blob_size + data_blob_offset, len(compressed_cell_data), raw_size
+                                )
+
+                                if in_place:
+                                    written.append((sub_cell, data_blob_size + data_blob_offset, len(compressed_cell_data), raw_size))
+
+                                start = time.perf_counter()
+                                f.write(compressed_cell_data)
+
+                                if self.stats is not None:
+                                    self.stats.record(data_type, "write", start, len(compressed_cell_data), len(compressed_cell_data))
+
+                                data_blob_size += len(compressed_cell_data)
+
+                            sub_cells_processed += 1
+
+                    progress.update("write", sub_cells_processed, sub_cell_count)
+
+                start = time.perf_counter()
+                f.seek(len(header_data))
+                f.write(cell_header_table.tobytes())
+
+                if self.stats is not None:
+                    self.stats.record("file", "pack_headers", start, bytes_out=cell_header_table.nbytes + len(header_data))
+
+            if self.is_mapped_file(output_file_path):
+                # A mapped file can't be replaced on Windows, so it is closed first
+                logger.debug("Closing the map of '%s' to replace it", self.file_path)
+                self.close()
+                closed = True
+
+            os.replace(write_path, output_file_path)
+
+        except BaseException:
+            # Failed or cancelled, only the temp file is removed, never the output
+            encoded_sub_cells.close()
+            if os.path.exists(write_path):
+                os.remove(write_path)
+
+            if closed:
+                # The source is still there, map it again for the chunks close() released
+                self.read_source()
+                for sub_cell in self.iter_sub_cells():
+                    if type(sub_cell.compressed_data) is memoryview:
+                        index = sub_cell.meta_data["index"]
+                        sub_cell.compressed_data = self.original_data[index:index + sub_cell.meta_data["compressed"]]
+            raise
 
-        print(f"\r{bcolors.GOOD}[INFO] Writing to... {output_file_path}{bcolors.ENDC}", end="")
-        with open(output_file_path, "wb") as f:
-            f.write(new_data)
+        if in_place:
+            self.cell_header_table[:] = cell_header_table  # Copied into, so existing cell_headers views stay valid
 
-        print(f"\r{bcolors.GOOD}[INFO] Saved to '{output_file_path}'{bcolors.ENDC}")
+            # What was written is now what is on disk. The chunks are sliced out of the new file as on load, rather than
+            # all being held in memory until the save is done
+            self.close()
+            self.read_source()
+            for sub_cell, index, compressed_size, size in written:
+                sub_cell.mark_clean(self.original_data[index:index + compressed_size], index, size)
 
+        totals = compressor.totals()
+        logger.info(
+            "Saved to '%s' | Compression '%s': %d -> %d bytes in %.3fs",
+            output_file_path, compression, totals["raw"], totals["compressed"], totals["seconds"]
+        )
 
+        self.last_write_report = compressor.report
+        return compressor.report
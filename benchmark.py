@@ -0,0 +1,185 @@
+import os
+import sys
+import glob
+import json
+import time
+import platform
+import argparse
+import tempfile
+import multiprocessing
+
+from ScrapTiles import TileFile
+from ScrapTiles.generate import generate_tile, TERRAINS
+from ScrapTiles.edit import mip, assets
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_TILES = [os.path.join(ROOT, "DemoTile.tile"), os.path.join(ROOT, "Empty.tile")] + sorted(glob.glob(os.path.join(ROOT, "debug_tiles", "*.tile")))
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB elsewhere
+
+
+def timed(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def bench_tile(path, repeat):
+    file_size = os.path.getsize(path)
+    info = TileFile.stat(path)
+    cells = info.width * info.height
+    square = info.width == info.height
+
+    timings = {}
+    output_path = os.path.join(tempfile.gettempdir(), f"scraptiles_bench_{os.getpid()}.tile")
+
+    def record(name, seconds):
+        timings[name] = {
+            "seconds": seconds,
+            "mb_per_s": file_size / seconds / 1024 / 1024 if seconds else None,
+            "cells_per_s": cells / seconds if seconds else None,
+        }
+
+    def decode():
+        tile = TileFile(path, lazy=True)
+        tile.load_sub_cells(list(tile.iter_sub_cells()))
+        return tile
+
+    record("load", timed(lambda: TileFile(path), repeat)[0])
+    record("open_lazy", timed(lambda: TileFile(path, lazy=True), repeat)[0])
+    record("decode", timed(decode, repeat)[0])
+
+    if square:
+        tile = TileFile(path)
+        seconds, modifier = timed(lambda: mip.Modifier(tile), repeat)
+        record("mip_modifier", seconds)
+        record("mip_update", timed(modifier.update, repeat)[0])
+
+    def modify_assets():
+        tile = TileFile(path, sections=["assets"])
+        with assets.Modifier(tile) as asset:
+            for index in range(10):
+                asset.create_object(
+                    assets.Assets.env_nature_rocks_large01,
+                    (index * 3, index * 3, 2), (0.7067, 0.0237, 0.0237, 0.7067), (0.25, 0.25, 0.25), 2, {"rock": 4285101422}
+                )
+        return tile
+
+    record("asset_modify", timed(modify_assets, repeat)[0])
+
+    tile = TileFile(path)
+    record("write", timed(lambda: tile.write_file(output_path, recompress=True), repeat)[0])
+
+    # A freshly loaded tile, so nothing is dirty and every sub cell is copied across
+    tile = TileFile(path)
+    record("write_passthrough", timed(lambda: tile.write_file(output_path), repeat)[0])
+
+    if os.path.exists(output_path):
+        os.remove(output_path)
+
+    return {
+        "file_size": file_size,
+        "cells": cells,
+        "peak_rss_mb": peak_rss_mb(),
+        "timings": timings,
+    }
+
+
+def compare(results, previous, threshold):
+    regressions = []
+    for tile_name, result in results.items():
+        old = previous.get("results", {}).get(tile_name)
+        if old is None:
+            continue
+
+        for name, timing in result["timings"].items():
+            old_timing = old["timings"].get(name)
+            if old_timing and timing["seconds"] > old_timing["seconds"] * (1 + threshold):
+                regressions.append((tile_name, name, old_timing["seconds"], timing["seconds"]))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks loading, editing and saving tiles")
+    parser.add_argument("--tiles", nargs="*", default=SAMPLE_TILES, help="Tiles to benchmark (default: the bundled samples)")
+    parser.add_argument("--large", nargs="*", type=int, default=[16, 32], help="Sizes of generated large (N x N cell) tiles")
+    parser.add_argument("--terrain", default="noise", choices=TERRAINS, help="Terrain of the generated tiles")
+    parser.add_argument("--assets", type=int, default=10, help="Assets per cell in the generated tiles")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement, the fastest is kept")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the results")
+    parser.add_argument("--compare", default=None, help="Previous results file to check for regressions against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Slowdown (fraction) counted as a regression")
+    args = parser.parse_args(argv)
+
+    paths = list(args.tiles)
+    temp_dir = tempfile.mkdtemp(prefix="scraptiles_bench_")
+    for size in args.large:
+        path = os.path.join(temp_dir, f"{args.terrain}_{size}x{size}.tile")
+        generate_tile(path, size, size, args.terrain, args.assets, seed=size)
+        paths.append(path)
+
+    results = {}
+
+    # Every tile runs in a fresh process, so peak RSS is per tile
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        for path in paths:
+            name = os.path.basename(path)
+            results[name] = pool.apply(bench_tile, (path, args.repeat))
+
+            peak_rss = results[name]["peak_rss_mb"]
+            peak_rss = "n/a" if peak_rss is None else f"{peak_rss:.0f} MiB"  # Not available on Windows
+
+            print(f"{name} ({results[name]['file_size'] / 1024:.0f} KiB, {results[name]['cells']} cells, peak RSS {peak_rss})")
+            for op, timing in results[name]["timings"].items():
+                print(f"  {op:<18} {timing['seconds'] * 1000:9.2f} ms {timing['mb_per_s']:9.2f} MB/s {timing['cells_per_s']:10.0f} cells/s")
+
+    for path in paths[len(args.tiles):]:
+        os.remove(path)
+    os.rmdir(temp_dir)
+
+    output = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"Results written to '{args.output}'")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+
+        for tile_name, name, old, new in regressions:
+            print(f"[REGRESSION] {tile_name} {name}: {old * 1000:.2f} ms -> {new * 1000:.2f} ms")
+
+        if regressions:
+            return 1
+        print("No regressions")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())